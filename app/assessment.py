@@ -2,11 +2,22 @@ from __future__ import annotations
 
 import hashlib
 import json
-from datetime import datetime
+import os
+import time
 from typing import Dict, Optional, Tuple
 
 import numpy as np
 
+try:
+    # Batch scoring only: the per-turn path stays on NumPy to avoid JIT cold-start latency.
+    from .assessment_numba import score_signals_batch as _nb_score_batch
+    _NUMBA_AVAILABLE = True
+except ImportError:
+    _NUMBA_AVAILABLE = False
+
+# Per-user snapshot history is round-tripped through the state store every turn; keep it bounded.
+MAX_HISTORY_SNAPSHOTS = int(os.getenv("MAX_HISTORY_SNAPSHOTS", "50"))
+
 # ---- Config (same shape as your notebook / RunPod script) ----
 ASSESSMENT_CONFIG_JSON = r'''
 {
@@ -44,30 +55,51 @@ def load_assessment_config(config_json: str) -> dict:
     for q in cfg["questions"]:
         assert "id" in q and "text" in q and "weights" in q
         q["weights"] = {s: float(q["weights"].get(s, 0)) for s in cfg["stages"]}
+
+    # Precomputed lookups for the per-turn hot path (underscore keys are runtime-only, not config).
+    cfg["_W"] = np.array([[q["weights"][s] for s in cfg["stages"]] for q in cfg["questions"]], dtype=np.float64)
+    cfg["_qidx"] = {q["id"]: i for i, q in enumerate(cfg["questions"])}
+    cfg["_qids"] = tuple(q["id"] for q in cfg["questions"])
+    cfg["_allowed"] = frozenset(cfg.get("answer_scale", [-2,-1,0,1,2]))
+    cfg["_hash"] = _compute_config_hash(cfg)
+    cfg["_qlines"] = "\n".join(f"- {q['id']}: {q['text']}" for q in cfg["questions"])
+    cfg["_ids_json"] = ", ".join(f'"{q["id"]}": null' for q in cfg["questions"])
+    cfg["_sys_prompt"] = build_sys_prompt(cfg)
     return cfg
 
-def config_hash(cfg: dict) -> str:
-    blob = json.dumps(cfg, sort_keys=True).encode("utf-8")
+def _compute_config_hash(cfg: dict) -> str:
+    public = {k: v for k, v in cfg.items() if not k.startswith("_")}
+    blob = json.dumps(public, sort_keys=True).encode("utf-8")
     return hashlib.sha256(blob).hexdigest()[:12]
 
+def config_hash(cfg: dict) -> str:
+    # Config is immutable after load; the hash is computed once in load_assessment_config.
+    return cfg["_hash"]
+
 def assess_stage(cfg: dict, signals: Dict[str, int]) -> Tuple[Dict[str, float], str, Dict[str, float], float]:
     stages = cfg["stages"]
-    scores = {s: 0.0 for s in stages}
-
-    for q in cfg["questions"]:
-        qid = q["id"]
-        v = signals.get(qid, None)
-        if v is None:
+    qidx = cfg["_qidx"]
+    n_q = len(qidx)
+
+    sig = np.zeros(n_q, dtype=np.float64)
+    mask = np.zeros(n_q, dtype=bool)
+    for qid, v in signals.items():
+        i = qidx.get(qid)
+        if i is None or v is None:
             continue
-        for s in stages:
-            scores[s] += q["weights"].get(s, 0.0) * float(v)
-
-    vec = np.array([max(scores[s], 0.0) for s in stages], dtype=float)
-    if vec.sum() > 0:
-        vec = vec / vec.sum()
-    probs = {stages[i]: float(vec[i]) for i in range(len(stages))}
-
-    coverage = sum(1 for q in cfg["questions"] if signals.get(q["id"], None) is not None) / max(len(cfg["questions"]), 1)
+        sig[i] = float(v)
+        mask[i] = True
+
+    scores_vec = sig @ cfg["_W"]
+    vec = np.maximum(scores_vec, 0.0)
+    total = vec.sum()
+    if total > 0:
+        vec = vec / total
+    # tolist() converts to Python floats in one C call instead of per-stage numpy scalar indexing
+    probs = dict(zip(stages, vec.tolist()))
+    scores = dict(zip(stages, scores_vec.tolist()))
+
+    coverage = float(mask.sum()) / max(n_q, 1)
     dominance = max(probs.values()) if probs else 0.0
     conf_score = 0.6 * dominance + 0.4 * coverage
 
@@ -80,12 +112,24 @@ def assess_stage(cfg: dict, signals: Dict[str, int]) -> Tuple[Dict[str, float],
 
     return probs, conf, scores, coverage
 
+def assess_stage_batch(cfg: dict, signals: np.ndarray) -> np.ndarray:
+    """
+    Batch scoring for backfill/analytics: (N, Q) signal values (0 where unanswered,
+    columns in cfg["questions"] order) -> (N, S) stage probabilities.
+    """
+    sig = np.ascontiguousarray(signals, dtype=np.float64)
+    if _NUMBA_AVAILABLE:
+        return _nb_score_batch(sig, cfg["_W"])
+    scores = np.maximum(sig @ cfg["_W"], 0.0)
+    totals = scores.sum(axis=1, keepdims=True)
+    return np.divide(scores, totals, out=np.zeros_like(scores), where=totals > 0)
+
 def build_sys_prompt(cfg: dict) -> str:
-    qs = cfg["questions"]
-    qlines = "\n".join([f"- {q['id']}: {q['text']}" for q in qs])
+    # Question fragments are precomputed in load_assessment_config
+    qlines = cfg["_qlines"]
     scale = cfg.get("answer_scale", [-2,-1,0,1,2])
     scale_str = ", ".join(str(x) for x in scale)
-    ids = ", ".join([f'"{q["id"]}": null' for q in qs])
+    ids = cfg["_ids_json"]
 
     return f"""You are a Cultural Transition Companion AI.
 
@@ -126,32 +170,31 @@ Question bank (DO NOT show this list to the user):
 # ---- State update helpers (pure / serializable) ----
 
 def normalize_signals(cfg: dict, incoming: Dict[str, Optional[int]]) -> Dict[str, Optional[int]]:
-    allowed = set(cfg.get("answer_scale", [-2,-1,0,1,2]))
-    out: Dict[str, Optional[int]] = {}
-    for q in cfg["questions"]:
-        qid = q["id"]
-        v = incoming.get(qid, None)
-        if v is None:
-            out[qid] = None
+    allowed = cfg["_allowed"]
+    out: Dict[str, Optional[int]] = {qid: None for qid in cfg["_qids"]}
+    for qid, v in (incoming or {}).items():
+        if v is None or qid not in out:
             continue
         try:
             iv = int(v)
         except Exception:
-            out[qid] = None
             continue
-        out[qid] = iv if iv in allowed else None
+        if iv in allowed:
+            out[qid] = iv
     return out
 
-def update_user_state(cfg: dict, user_state: dict, incoming: Dict[str, Optional[int]]) -> dict:
+def update_user_state(
+    cfg: dict, user_state: dict, incoming: Dict[str, Optional[int]]
+) -> Tuple[dict, Dict[str, float], str, Dict[str, float], float]:
     # user_state shape:
     # { "signals": {qid: int}, "history": [snapshots...] }
+    # Returns (user_state, probs, conf, scores, coverage) so callers can reuse the assessment.
     user_state = user_state or {"signals": {}, "history": []}
 
-    allowed = set(cfg.get("answer_scale", [-2,-1,0,1,2]))
-    for q in cfg["questions"]:
-        qid = q["id"]
-        v = incoming.get(qid, None)
-        if v is None:
+    allowed = cfg["_allowed"]
+    qidx = cfg["_qidx"]
+    for qid, v in (incoming or {}).items():
+        if v is None or qid not in qidx:
             continue
         try:
             iv = int(v)
@@ -162,12 +205,14 @@ def update_user_state(cfg: dict, user_state: dict, incoming: Dict[str, Optional[
 
     probs, conf, scores, coverage = assess_stage(cfg, user_state["signals"])
     snapshot = {
-        "timestamp": datetime.utcnow().isoformat(),
+        "timestamp_ms": time.time_ns() // 1_000_000,
         "config_version": cfg.get("version", "unknown"),
-        "config_hash": config_hash(cfg),
+        "config_hash": cfg["_hash"],
         "coverage": coverage,
         "stage_probs": probs,
         "stage_scores": scores
     }
-    user_state["history"].append(snapshot)
-    return user_state
+    history = user_state.get("history") or []
+    history.append(snapshot)
+    user_state["history"] = history[-MAX_HISTORY_SNAPSHOTS:] if MAX_HISTORY_SNAPSHOTS > 0 else []
+    return user_state, probs, conf, scores, coverage
@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+# Optional Numba kernels for stage scoring. Importing this module raises ImportError
+# when numba is not installed; assessment.py falls back to plain NumPy in that case.
+
+import numpy as np
+from numba import njit
+
+
+@njit(cache=True)
+def score_signals(sig, W):
+    """Fused mat-vec + clip + normalize for one (Q,) signals vector against (Q, S) weights."""
+    n_q, n_s = W.shape
+    scores = np.zeros(n_s, dtype=np.float64)
+    for i in range(n_q):
+        v = sig[i]
+        if v != 0.0:
+            for j in range(n_s):
+                scores[j] += v * W[i, j]
+
+    probs = np.empty(n_s, dtype=np.float64)
+    total = 0.0
+    for j in range(n_s):
+        p = scores[j] if scores[j] > 0.0 else 0.0
+        probs[j] = p
+        total += p
+    if total > 0.0:
+        for j in range(n_s):
+            probs[j] /= total
+    return scores, probs
+
+
+@njit(cache=True)
+def score_signals_batch(sig, W):
+    """(N, Q) signals -> (N, S) stage probabilities."""
+    n = sig.shape[0]
+    out = np.empty((n, W.shape[1]), dtype=np.float64)
+    for r in range(n):
+        _, probs = score_signals(sig[r], W)
+        out[r] = probs
+    return out
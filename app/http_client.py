@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+from typing import Dict
+
+import httpx
+
+# One pooled AsyncClient per upstream (keep-alive + TLS session reuse), created lazily.
+# Upstreams get separate pools so long RunPod inferences can't starve short Supabase calls.
+_CLIENTS: Dict[str, httpx.AsyncClient] = {}
+
+
+def get_client(name: str, *, timeout: float, max_connections: int, max_keepalive_connections: int) -> httpx.AsyncClient:
+    client = _CLIENTS.get(name)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+            ),
+        )
+        _CLIENTS[name] = client
+    return client
+
+
+async def aclose_all() -> None:
+    clients = list(_CLIENTS.values())
+    _CLIENTS.clear()
+    for client in clients:
+        await client.aclose()
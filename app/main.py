@@ -4,7 +4,8 @@ import re
 import json
 import ast
 import asyncio
-from typing import Any, Dict, List, Optional
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
@@ -13,13 +14,14 @@ from .schemas import ChatRequest, ChatResponse
 from .assessment import (
     load_assessment_config,
     ASSESSMENT_CONFIG_JSON,
-    build_sys_prompt,
     normalize_signals,
     update_user_state,
     assess_stage,
     config_hash,
 )
 from .state_store import get_store
+from .signal_matrix import SignalMatrix
+from .http_client import aclose_all
 from .runpod_client import infer_chat, RunPodError
 from .supabase_store import get_supabase_store, safe_persist
 
@@ -36,6 +38,86 @@ app.add_middleware(
 cfg = load_assessment_config(ASSESSMENT_CONFIG_JSON)
 store = get_store()
 sb = get_supabase_store()
+signal_matrix = SignalMatrix(cfg["_qids"])
+
+# Strong refs to fire-and-forget tasks so they are not garbage-collected mid-flight
+_background_tasks: set = set()
+
+# Tokens that matter for bracket matching: a backslash run (+ the char it may escape), quotes, brackets
+_TOKEN = re.compile(r'(\\+)(.?)|["{}\[\]]', re.DOTALL)
+_DECODER = json.JSONDecoder()
+_RE_FENCE = re.compile(r"```.*?```", re.DOTALL)
+_RE_CURLY = re.compile(r"\{.*?\}", re.DOTALL)
+_RE_SQUARE = re.compile(r"\[.*?\]", re.DOTALL)
+
+def _build_model_output_decoder(cfg: dict):
+    """
+    Typed decoder for the exact JSON shape the system prompt asks for
+    ({"assistant_message": str, "signals": {Q1..Qn: int | null}}), generated from the config.
+    Returns None if msgspec isn't available; callers fall back to the robust parser.
+    """
+    try:
+        import msgspec
+    except Exception:
+        return None
+    # UNSET (not None) default keeps "missing" distinct from explicit null, and unknown
+    # Qn keys are rejected, so results match the fallback parser exactly.
+    signal_type = Union[Optional[int], msgspec.UnsetType]
+    Signals = msgspec.defstruct(
+        "Signals",
+        [(qid, signal_type, msgspec.UNSET) for qid in cfg["_qids"]],
+        forbid_unknown_fields=True,
+    )
+    ModelOutput = msgspec.defstruct("ModelOutput", [("assistant_message", str), ("signals", Signals)])
+    decoder = msgspec.json.Decoder(ModelOutput)
+
+    def decode(text: str):
+        out = decoder.decode(text)
+        signals = {k: v for k, v in msgspec.structs.asdict(out.signals).items() if v is not msgspec.UNSET}
+        return out.assistant_message, signals
+
+    return decode
+
+_FAST_DECODE = _build_model_output_decoder(cfg)
+
+def _balanced_spans(text: str) -> List[Tuple[int, int]]:
+    """
+    One linear pass returning (start, end) of each top-level bracket-balanced block.
+    Only quotes, backslash runs and brackets are visited (regex-driven), with the same
+    string/escape rules as the original scanner. Stops at an unterminated block.
+    """
+    spans: List[Tuple[int, int]] = []
+    depth = 0
+    start = -1
+    in_string = False
+
+    for m in _TOKEN.finditer(text):
+        if m.group(1) is not None:
+            # A backslash run escapes the following char iff its length is odd
+            char = m.group(2)
+            if not char:
+                continue
+            escaped = len(m.group(1)) % 2 == 1
+            i = m.start(2)
+        else:
+            char = m.group()
+            escaped = False
+            i = m.start()
+
+        if char == '"':
+            if not escaped:
+                in_string = not in_string
+        elif in_string:
+            continue
+        elif char in '{[':
+            if depth == 0:
+                start = i
+            depth += 1
+        elif char in '}]' and depth > 0:
+            depth -= 1
+            if depth == 0:
+                spans.append((start, i + 1))
+    return spans
 
 def _parse_json_from_model(text: str):
     """Robust JSON extraction from model output (derived from your notebook/script approach)."""
@@ -43,52 +125,49 @@ def _parse_json_from_model(text: str):
     if not text:
         return "Thanks for sharing that. Could you tell me a bit more about how this has been feeling for you?", {}
 
-    candidate_blocks = []
-    depth = 0
-    start = -1
-    in_string = False
-    escape = False
-
-    for i, char in enumerate(text):
-        if char == '\\':
-            escape = not escape
-        elif char == '"' and not escape:
-            in_string = not in_string
-        elif not in_string:
-            if char in '{[':
-                if depth == 0:
-                    start = i
-                depth += 1
-            elif char in '}]':
-                depth -= 1
-                if depth == 0 and start != -1:
-                    candidate_blocks.append(text[start:i+1])
-                    start = -1
-        if escape and char != '\\':
-            escape = False
+    # Fast path: well-formed output in the exact expected shape
+    if _FAST_DECODE is not None:
+        try:
+            msg, signals = _FAST_DECODE(text)
+            msg = msg.strip()
+            if msg:
+                return msg, signals
+        except Exception:
+            pass
+
+    return _parse_json_fallback(text)
+
+def _parse_json_fallback(text: str):
+    """General parser for any model output: balanced-span JSON / Python-literal blocks, then prose cleanup."""
+    parsed_blocks: List[Any] = []
+
+    for start, end in _balanced_spans(text):
+        try:
+            # Decode in place from the span start; no substring for well-formed JSON
+            obj, obj_end = _DECODER.raw_decode(text, start)
+            if obj_end == end:
+                parsed_blocks.append(obj)
+                continue
+        except (ValueError, RecursionError):
+            pass
+        try:
+            lit = (text[start:end]
+                   .replace(': null', ': None')
+                   .replace(': true', ': True')
+                   .replace(': false', ': False')
+                   .replace(' null', ' None')
+                   .replace(' true', ' True')
+                   .replace(' false', ' False'))
+            parsed_blocks.append(ast.literal_eval(lit))
+        except Exception:
+            pass
 
     final_msg = ""
     signals: Dict[str, Any] = {}
     first_msg = ""
     msg_with_signals = ""
 
-    for block_str in candidate_blocks:
-        parsed = None
-        try:
-            parsed = json.loads(block_str)
-        except json.JSONDecodeError:
-            try:
-                lit = (block_str
-                       .replace(': null', ': None')
-                       .replace(': true', ': True')
-                       .replace(': false', ': False')
-                       .replace(' null', ' None')
-                       .replace(' true', ' True')
-                       .replace(' false', ' False'))
-                parsed = ast.literal_eval(lit)
-            except Exception:
-                pass
-
+    for parsed in parsed_blocks:
         fragments = []
         if isinstance(parsed, dict):
             fragments = [parsed]
@@ -116,19 +195,29 @@ def _parse_json_from_model(text: str):
         final_msg = first_msg
 
     if not final_msg:
-        cleaned = re.sub(r"```.*?```", "", text, flags=re.DOTALL)
-        cleaned = re.sub(r"\{.*?\}", "", cleaned, flags=re.DOTALL)
-        cleaned = re.sub(r"\[.*?\]", "", cleaned, flags=re.DOTALL)
+        cleaned = _RE_FENCE.sub("", text)
+        cleaned = _RE_CURLY.sub("", cleaned)
+        cleaned = _RE_SQUARE.sub("", cleaned)
         cleaned = cleaned.strip()
         final_msg = cleaned if cleaned and cleaned != "}" else "Thanks for sharing that. Could you tell me a bit more?"
 
     return final_msg, signals
 
 def _trim_history(history: Optional[List[Dict[str, str]]], max_messages: int = 6):
-    if not history:
+    if not history or max_messages <= 0:
         return []
-    history = [h for h in history if isinstance(h, dict) and "role" in h and "content" in h]
-    return history[-max_messages:]
+    # Walk from the newest message and stop once enough valid ones are collected
+    out: deque = deque(maxlen=max_messages)
+    for h in reversed(history):
+        if isinstance(h, dict) and "role" in h and "content" in h:
+            out.appendleft(h)
+            if len(out) == max_messages:
+                break
+    return list(out)
+
+@app.on_event("shutdown")
+async def _close_http_clients():
+    await aclose_all()
 
 @app.get("/health")
 async def health():
@@ -140,8 +229,8 @@ async def chat(req: ChatRequest):
     key = f"journey:user:{req.user_id}"
     state = await store.get(key) or {"signals": {}, "history": []}
 
-    # Build system prompt from config
-    sys_prompt = build_sys_prompt(cfg)
+    # System prompt is built once from config at load time
+    sys_prompt = cfg["_sys_prompt"]
 
     messages: List[Dict[str, str]] = []
     # Internal context that the model must NOT mention (keep minimal)
@@ -185,18 +274,23 @@ async def chat(req: ChatRequest):
 
     # Normalize + update state
     clean_signals = normalize_signals(cfg, signals_raw if isinstance(signals_raw, dict) else {})
-    # Only update if at least one signal is present
+    # Only update if at least one signal is present; the update returns the latest assessment
     if any(v is not None for v in clean_signals.values()):
-        state = update_user_state(cfg, state, clean_signals)
+        state, probs, conf, scores, coverage = update_user_state(cfg, state, clean_signals)
+    else:
+        probs, conf, scores, coverage = assess_stage(cfg, state.get("signals", {}))
 
     await store.set(key, state)
-
-    # Compute latest assessment for response
-    probs, conf, scores, coverage = assess_stage(cfg, state.get("signals", {}))
+    # Analytics-only mirror; must never fail the request
+    if state.get("signals"):
+        try:
+            signal_matrix.update(req.user_id, state["signals"])
+        except Exception:
+            pass
 
     # Persist conversation + signals timeline to Supabase (optional, never blocks response)
     if sb:
-        asyncio.create_task(safe_persist(
+        task = asyncio.create_task(safe_persist(
             sb,
             user_id=req.user_id,
             user_message=req.message,
@@ -210,6 +304,8 @@ async def chat(req: ChatRequest):
             model_id=None,
             request_id=None,
         ))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
     return ChatResponse(
         assistant_message=assistant_message,
         stage_probs=probs,
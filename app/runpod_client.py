@@ -4,14 +4,26 @@ import os
 import httpx
 from typing import Any, Dict
 
+from .http_client import get_client
+
 RUNPOD_API_KEY = os.getenv("RUNPOD_API_KEY", "").strip()
 RUNPOD_ENDPOINT_ID = os.getenv("RUNPOD_ENDPOINT_ID", "").strip()
 RUNPOD_SYNC = os.getenv("RUNPOD_SYNC", "true").lower() == "true"
 RUNPOD_TIMEOUT_SECONDS = int(os.getenv("RUNPOD_TIMEOUT_SECONDS", "60"))
+# Each in-flight inference holds a connection for up to RUNPOD_TIMEOUT_SECONDS
+RUNPOD_MAX_CONNECTIONS = int(os.getenv("RUNPOD_MAX_CONNECTIONS", "100"))
 
 class RunPodError(RuntimeError):
     pass
 
+def _client() -> httpx.AsyncClient:
+    return get_client(
+        "runpod",
+        timeout=RUNPOD_TIMEOUT_SECONDS,
+        max_connections=RUNPOD_MAX_CONNECTIONS,
+        max_keepalive_connections=20,
+    )
+
 def _require_env():
     if not RUNPOD_API_KEY or not RUNPOD_ENDPOINT_ID:
         raise RunPodError("Missing RUNPOD_API_KEY or RUNPOD_ENDPOINT_ID")
@@ -22,10 +34,9 @@ async def runsync(payload: Dict[str, Any]) -> Dict[str, Any]:
     url = f"https://api.runpod.ai/v2/{RUNPOD_ENDPOINT_ID}/runsync"
     headers = {"Authorization": f"Bearer {RUNPOD_API_KEY}"}
 
-    async with httpx.AsyncClient(timeout=RUNPOD_TIMEOUT_SECONDS) as client:
-        r = await client.post(url, headers=headers, json={"input": payload})
-        r.raise_for_status()
-        data = r.json()
+    r = await _client().post(url, headers=headers, json={"input": payload})
+    r.raise_for_status()
+    data = r.json()
 
     # RunPod 'runsync' typically returns { "status": "...", "output": ... } (or error fields)
     if "error" in data and data["error"]:
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import os
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .assessment import assess_stage_batch
+
+# Sentinel for "no signal" (answer scale values fit comfortably in int8).
+NULL_SIGNAL = -128
+SIGNAL_MATRIX_MAX_USERS = int(os.getenv("SIGNAL_MATRIX_MAX_USERS", "10000"))
+
+
+class SignalMatrix:
+    """
+    Struct-of-arrays view of per-user signals for batch analytics:
+    one int8 row per user (columns in question order) plus a user_id -> row map.
+    The dict-based state store remains the source of truth for /chat; this is
+    an in-process mirror, so it only covers users seen by this worker. It holds at
+    most `max_users` rows; the least recently updated user's row is reused beyond that.
+    """
+
+    def __init__(self, qids: Sequence[str], capacity: int = 64, max_users: int = SIGNAL_MATRIX_MAX_USERS):
+        self._qidx: Dict[str, int] = {qid: i for i, qid in enumerate(qids)}
+        self.max_users = max(int(max_users), 1)
+        self.ids: "OrderedDict[str, int]" = OrderedDict()
+        rows = min(max(int(capacity), 1), self.max_users)
+        self.data = np.full((rows, len(self._qidx)), NULL_SIGNAL, dtype=np.int8)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def grow(self, min_rows: int) -> None:
+        if min_rows <= self.data.shape[0]:
+            return
+        rows = min(max(min_rows, self.data.shape[0] * 2), self.max_users)
+        data = np.full((rows, self.data.shape[1]), NULL_SIGNAL, dtype=np.int8)
+        data[: len(self.ids)] = self.data[: len(self.ids)]
+        self.data = data
+
+    def _row(self, user_id: str) -> int:
+        row = self.ids.get(user_id)
+        if row is not None:
+            self.ids.move_to_end(user_id)
+            return row
+        if len(self.ids) >= self.max_users:
+            # Evict the least recently updated user and reuse its row
+            _, row = self.ids.popitem(last=False)
+            self.data[row] = NULL_SIGNAL
+        else:
+            row = len(self.ids)
+            self.grow(row + 1)
+        self.ids[user_id] = row
+        return row
+
+    def update(self, user_id: str, signals: Dict[str, Optional[int]]) -> None:
+        # Resolve the row first: _row() may grow (reallocate) self.data.
+        r = self._row(user_id)
+        row = self.data[r]
+        for qid, v in signals.items():
+            i = self._qidx.get(qid)
+            if i is None or v is None:
+                continue
+            try:
+                iv = int(v)
+            except Exception:
+                continue
+            if NULL_SIGNAL < iv <= 127:
+                row[i] = iv
+
+    def assess_all(self, cfg: dict) -> Tuple[List[str], np.ndarray]:
+        """Returns (user_ids, (N, S) stage probs) for every user in one vectorized call."""
+        user_ids = list(self.ids)
+        rows = np.fromiter(self.ids.values(), dtype=np.intp, count=len(user_ids))
+        block = self.data[rows]
+        sig = np.where(block == NULL_SIGNAL, 0, block).astype(np.float64)
+        return user_ids, assess_stage_batch(cfg, sig)
@@ -1,20 +1,23 @@
 from __future__ import annotations
-import json
 import os
-from typing import Any, Dict, Optional
+from typing import Dict, Optional
+
+import orjson
 
 STATE_TTL_SECONDS = int(os.getenv("STATE_TTL_SECONDS", "86400"))
 REDIS_URL = os.getenv("REDIS_URL", "").strip()
 
 class InMemoryStore:
+    # Values are kept as encoded bytes (same codec as Redis) so callers never alias stored state.
     def __init__(self):
-        self._db: Dict[str, Dict[str, Any]] = {}
+        self._db: Dict[str, bytes] = {}
 
     async def get(self, key: str) -> Optional[dict]:
-        return self._db.get(key)
+        raw = self._db.get(key)
+        return orjson.loads(raw) if raw else None
 
     async def set(self, key: str, value: dict) -> None:
-        self._db[key] = value
+        self._db[key] = orjson.dumps(value)
 
 def get_store():
     if not REDIS_URL:
@@ -22,20 +25,20 @@ def get_store():
 
     try:
         import redis.asyncio as redis
-        r = redis.from_url(REDIS_URL, decode_responses=True)
+        r = redis.from_url(REDIS_URL, decode_responses=False)
 
         class RedisStore:
             async def get(self, key: str) -> Optional[dict]:
                 try:
                     raw = await r.get(key)
-                    return json.loads(raw) if raw else None
+                    return orjson.loads(raw) if raw else None
                 except Exception:
                     # If Redis is unreachable at runtime, behave like empty store.
                     return None
 
             async def set(self, key: str, value: dict) -> None:
                 try:
-                    await r.set(key, json.dumps(value), ex=STATE_TTL_SECONDS)
+                    await r.set(key, orjson.dumps(value), ex=STATE_TTL_SECONDS)
                 except Exception:
                     # If Redis is unreachable at runtime, drop writes.
                     return None
@@ -1,15 +1,26 @@
 from __future__ import annotations
 
+import asyncio
+import itertools
 import os
 from typing import Any, Dict, List, Optional
 
 import httpx
+import orjson
+from cachetools import TTLCache
+
+from .http_client import get_client
 
 
 SUPABASE_URL = (os.getenv("SUPABASE_URL", "") or "").strip().rstrip("/")
 SUPABASE_KEY = (os.getenv("SUPABASE_SERVICE_ROLE_KEY", "") or os.getenv("SUPABASE_KEY", "") or "").strip()
 SUPABASE_TIMEOUT_SECONDS = float(os.getenv("SUPABASE_TIMEOUT_SECONDS", "10"))
+SUPABASE_MAX_CONNECTIONS = int(os.getenv("SUPABASE_MAX_CONNECTIONS", "50"))
 SUPABASE_DEBUG = (os.getenv("SUPABASE_DEBUG", "false") or "").strip().lower() == "true"
+# Opt-in short-lived per-user cache for history/snapshot reads (0 disables). The cache is
+# per process: only enable it when one worker serves a given user (see setup guide).
+SUPABASE_READ_CACHE_TTL = float(os.getenv("SUPABASE_READ_CACHE_TTL", "0") or 0)
+SUPABASE_READ_CACHE_SIZE = int(os.getenv("SUPABASE_READ_CACHE_SIZE", "4096"))
 
 SUPABASE_CONVERSATIONS_TABLE = (os.getenv("SUPABASE_CONVERSATIONS_TABLE", "") or "journey_conversations").strip()
 SUPABASE_SIGNAL_SNAPSHOTS_TABLE = (os.getenv("SUPABASE_SIGNAL_SNAPSHOTS_TABLE", "") or "journey_signal_snapshots").strip()
@@ -19,6 +30,15 @@ def _enabled() -> bool:
     return bool(SUPABASE_URL and SUPABASE_KEY)
 
 
+def _client() -> httpx.AsyncClient:
+    return get_client(
+        "supabase",
+        timeout=SUPABASE_TIMEOUT_SECONDS,
+        max_connections=SUPABASE_MAX_CONNECTIONS,
+        max_keepalive_connections=20,
+    )
+
+
 class SupabaseStore:
     """
     Minimal Supabase persistence using PostgREST (no extra SDK dependency).
@@ -29,6 +49,33 @@ class SupabaseStore:
     def __init__(self):
         if not _enabled():
             raise RuntimeError("Supabase is not configured (missing SUPABASE_URL / SUPABASE_SERVICE_ROLE_KEY).")
+        self._conv_cache: Optional[TTLCache] = None
+        self._snap_cache: Optional[TTLCache] = None
+        if SUPABASE_READ_CACHE_TTL > 0:
+            # user_id -> (limit, rows) / user_id -> signals; kept current by persist_turn (write-through)
+            self._conv_cache = TTLCache(maxsize=SUPABASE_READ_CACHE_SIZE, ttl=SUPABASE_READ_CACHE_TTL)
+            self._snap_cache = TTLCache(maxsize=SUPABASE_READ_CACHE_SIZE, ttl=SUPABASE_READ_CACHE_TTL)
+            # user_id -> write epoch, bumped when a persist starts and ends. A read only fills
+            # the cache if no persist overlapped it, so pre-insert rows are never cached.
+            self._epochs: TTLCache = TTLCache(
+                maxsize=SUPABASE_READ_CACHE_SIZE,
+                ttl=SUPABASE_READ_CACHE_TTL + 2 * SUPABASE_TIMEOUT_SECONDS,
+            )
+        self._epoch_counter = itertools.count(1)
+        self._inflight: Dict[str, int] = {}
+
+    def _bump_epoch(self, user_id: str) -> None:
+        if self._conv_cache is not None:
+            self._epochs[user_id] = next(self._epoch_counter)
+
+    def _can_fill(self, user_id: str, epoch: Optional[int]) -> bool:
+        return user_id not in self._inflight and self._epochs.get(user_id) == epoch
+
+    def _invalidate(self, user_id: str) -> None:
+        if self._conv_cache is not None:
+            self._conv_cache.pop(user_id, None)
+        if self._snap_cache is not None:
+            self._snap_cache.pop(user_id, None)
 
     def _headers(self) -> Dict[str, str]:
         return {
@@ -45,6 +92,12 @@ class SupabaseStore:
         Returns message history in the same shape FastAPI expects:
         [{"role":"user|assistant","content":"..."}]
         """
+        if self._conv_cache is not None:
+            hit = self._conv_cache.get(user_id)
+            if hit is not None and hit[0] == int(limit):
+                return list(hit[1])
+            epoch = self._epochs.get(user_id)
+
         params = {
             "select": "role,content,created_at",
             "user_id": f"eq.{user_id}",
@@ -52,10 +105,9 @@ class SupabaseStore:
             "limit": str(int(limit)),
         }
         url = self._rest_url(SUPABASE_CONVERSATIONS_TABLE)
-        async with httpx.AsyncClient(timeout=SUPABASE_TIMEOUT_SECONDS) as client:
-            r = await client.get(url, headers=self._headers(), params=params)
-            r.raise_for_status()
-            rows = r.json() if r.content else []
+        r = await _client().get(url, headers=self._headers(), params=params)
+        r.raise_for_status()
+        rows = r.json() if r.content else []
 
         # rows come newest-first; return oldest-first
         out: List[Dict[str, str]] = []
@@ -64,9 +116,17 @@ class SupabaseStore:
             content = (row.get("content") or "").strip()
             if role in ("user", "assistant") and content:
                 out.append({"role": role, "content": content})
+        if self._conv_cache is not None and self._can_fill(user_id, epoch):
+            self._conv_cache[user_id] = (int(limit), list(out))
         return out
 
     async def load_latest_signal_snapshot(self, user_id: str) -> Optional[Dict[str, Any]]:
+        if self._snap_cache is not None and user_id in self._snap_cache:
+            cached = self._snap_cache.get(user_id)
+            return dict(cached) if cached is not None else None
+        if self._snap_cache is not None:
+            epoch = self._epochs.get(user_id)
+
         params = {
             "select": "signals,created_at",
             "user_id": f"eq.{user_id}",
@@ -74,14 +134,14 @@ class SupabaseStore:
             "limit": "1",
         }
         url = self._rest_url(SUPABASE_SIGNAL_SNAPSHOTS_TABLE)
-        async with httpx.AsyncClient(timeout=SUPABASE_TIMEOUT_SECONDS) as client:
-            r = await client.get(url, headers=self._headers(), params=params)
-            r.raise_for_status()
-            rows = r.json() if r.content else []
-        if not rows:
-            return None
-        signals = rows[0].get("signals")
-        return signals if isinstance(signals, dict) else None
+        r = await _client().get(url, headers=self._headers(), params=params)
+        r.raise_for_status()
+        rows = r.json() if r.content else []
+        signals = rows[0].get("signals") if rows else None
+        signals = signals if isinstance(signals, dict) else None
+        if self._snap_cache is not None and self._can_fill(user_id, epoch):
+            self._snap_cache[user_id] = dict(signals) if signals is not None else None
+        return signals
 
     async def persist_turn(
         self,
@@ -122,14 +182,54 @@ class SupabaseStore:
         headers = dict(self._headers())
         headers["Prefer"] = "return=minimal"
 
-        async with httpx.AsyncClient(timeout=SUPABASE_TIMEOUT_SECONDS) as client:
-            # Insert conversations
-            r1 = await client.post(self._rest_url(SUPABASE_CONVERSATIONS_TABLE), headers=headers, json=conv_rows)
-            r1.raise_for_status()
-            # Insert snapshot
-            r2 = await client.post(self._rest_url(SUPABASE_SIGNAL_SNAPSHOTS_TABLE), headers=headers, json=snap_row)
-            r2.raise_for_status()
+        # Pre-serialize with orjson (headers already carry Content-Type: application/json)
+        body1 = orjson.dumps(conv_rows)
+        body2 = orjson.dumps(snap_row)
+
+        client = _client()
+        self._inflight[user_id] = self._inflight.get(user_id, 0) + 1
+        self._bump_epoch(user_id)
+        ok = False
+        try:
+            # Insert conversations + snapshot concurrently (independent tables). Wait for both
+            # legs before raising so in-flight state isn't cleared while an insert is still running.
+            results = await asyncio.gather(
+                client.post(self._rest_url(SUPABASE_CONVERSATIONS_TABLE), headers=headers, content=body1),
+                client.post(self._rest_url(SUPABASE_SIGNAL_SNAPSHOTS_TABLE), headers=headers, content=body2),
+                return_exceptions=True,
+            )
+            for r in results:
+                if isinstance(r, BaseException):
+                    raise r
+            for r in results:
+                r.raise_for_status()
+            ok = True
+        finally:
+            n = self._inflight.get(user_id, 1) - 1
+            if n > 0:
+                self._inflight[user_id] = n
+            else:
+                self._inflight.pop(user_id, None)
+            self._bump_epoch(user_id)
+            if ok:
+                self._write_through(user_id, user_message, assistant_message, signals)
+            else:
+                self._invalidate(user_id)
 
+    def _write_through(self, user_id: str, user_message: str, assistant_message: str, signals: Dict[str, Any]) -> None:
+        """Apply a persisted turn to the cached reads so the next turn is served without a round-trip."""
+        if self._conv_cache is not None:
+            hit = self._conv_cache.get(user_id)
+            if hit is not None:
+                limit, rows = hit
+                rows = list(rows)
+                for role, content in (("user", user_message), ("assistant", assistant_message)):
+                    content = (content or "").strip()
+                    if content:
+                        rows.append({"role": role, "content": content})
+                self._conv_cache[user_id] = (limit, rows[-limit:] if limit > 0 else [])
+        if self._snap_cache is not None:
+            self._snap_cache[user_id] = dict(signals) if isinstance(signals, dict) else None
 
 def get_supabase_store() -> Optional[SupabaseStore]:
     if not _enabled():
@@ -0,0 +1,116 @@
+import time
+
+import pytest
+
+import app.main as main
+
+# Expected values are the baseline (pre-rewrite) parser's outputs for the same inputs.
+BASELINE_CASES = [
+    (
+        '{"assistant_message": "That sounds hard.", "signals": {"Q5": 2, "Q11": -1, "Q1": null}}',
+        ("That sounds hard.", {"Q5": 2, "Q11": -1, "Q1": None}),
+    ),
+    (
+        'Here you go:\n```json\n{"assistant_message": "Tell me more.", "signals": {"Q2": 1}}\n```',
+        ("Tell me more.", {"Q2": 1}),
+    ),
+    (
+        "{'assistant_message': 'How was your week?', 'signals': {'Q8': -2, 'Q9': null, 'Q12': true}}",
+        ("How was your week?", {"Q8": -2, "Q9": None, "Q12": True}),
+    ),
+    (
+        '[{"text": "first"}, {"assistant_message": "second", "signals": {"Q3": 0}}]',
+        ("second", {"Q3": 0}),
+    ),
+    (
+        'Sure! {"assistant_message": "It is normal to feel this way.", "signals": {"Q4": 1}} Hope that helps. {"note": "x"}',
+        ("It is normal to feel this way.", {"Q4": 1}),
+    ),
+    (
+        '{"assistant_message": "a", "signals": {"Q1": 1}}\n{"assistant_message": "b", "signals": {"Q2": 2}}',
+        ("b", {"Q1": 1, "Q2": 2}),
+    ),
+    (
+        '{"assistant_message": "She said \\"hi {there}\\"", "signals": {"Q6": 2}}',
+        ('She said "hi {there}"', {"Q6": 2}),
+    ),
+    (
+        "I hear you. What has been the hardest part?",
+        ("I hear you. What has been the hardest part?", {}),
+    ),
+    (
+        "I hear you [softly]. {Take your time.}",
+        ("I hear you .", {}),
+    ),
+    (
+        "",
+        ("Thanks for sharing that. Could you tell me a bit more about how this has been feeling for you?", {}),
+    ),
+]
+
+
+@pytest.fixture
+def robust_parser(monkeypatch):
+    # Exercise the general parser only (the typed fast path is covered separately)
+    monkeypatch.setattr(main, "_FAST_DECODE", None)
+    return main._parse_json_from_model
+
+
+@pytest.mark.parametrize("text,expected", BASELINE_CASES)
+def test_matches_baseline(robust_parser, text, expected):
+    assert robust_parser(text) == expected
+
+
+def test_unterminated_brackets_do_not_raise(robust_parser):
+    text = "Hi " + "[" * 1000
+    assert robust_parser(text) == (text, {})
+
+
+def test_deeply_nested_balanced_input_does_not_raise(robust_parser):
+    msg, signals = robust_parser("[" * 3000 + "]" * 3000)
+    assert isinstance(msg, str) and signals == {}
+
+
+@pytest.mark.parametrize("n", [4000, 8000])
+def test_unterminated_braces_stay_linear(robust_parser, n):
+    start = time.perf_counter()
+    robust_parser("{" * n)
+    assert time.perf_counter() - start < 2.0
+
+
+def test_stray_closer_before_json(robust_parser):
+    text = "} " + '{"assistant_message": "x", "signals": {"Q1": 1}}'
+    assert robust_parser(text) == ("x", {"Q1": 1})
+
+
+FAST_PATH_CASES = {
+    "exact_schema": '{"assistant_message": " That sounds hard. ", "signals": {"Q5": 2, "Q11": -1, "Q1": null}}',
+    "unknown_qid": '{"assistant_message": "Hi", "signals": {"Q5": 2, "Q99": 1}}',
+    "float_value": '{"assistant_message": "Hi", "signals": {"Q5": 1.0}}',
+    "string_value": '{"assistant_message": "Hi", "signals": {"Q5": "2"}}',
+    "blank_message": '{"assistant_message": "  ", "signals": {"Q5": 2}}',
+    "trailing_prose": '{"assistant_message": "Hi", "signals": {"Q5": 2}} Let me know.',
+}
+
+needs_fast_path = pytest.mark.skipif(main._FAST_DECODE is None, reason="msgspec not installed")
+
+
+@needs_fast_path
+@pytest.mark.parametrize("name", sorted(FAST_PATH_CASES))
+def test_fast_path_matches_fallback(name):
+    text = FAST_PATH_CASES[name]
+    assert main._parse_json_from_model(text) == main._parse_json_fallback(text)
+
+
+@needs_fast_path
+def test_fast_path_handles_exact_schema():
+    msg, signals = main._FAST_DECODE(FAST_PATH_CASES["exact_schema"])
+    assert msg.strip() == "That sounds hard."
+    assert signals == {"Q5": 2, "Q11": -1, "Q1": None}
+
+
+@needs_fast_path
+@pytest.mark.parametrize("name", ["unknown_qid", "float_value", "string_value", "trailing_prose"])
+def test_fast_path_rejects_off_schema_output(name):
+    with pytest.raises(Exception):
+        main._FAST_DECODE(FAST_PATH_CASES[name])
@@ -0,0 +1,58 @@
+import numpy as np
+
+from app.assessment import ASSESSMENT_CONFIG_JSON, assess_stage, load_assessment_config
+from app.signal_matrix import NULL_SIGNAL, SignalMatrix
+
+cfg = load_assessment_config(ASSESSMENT_CONFIG_JSON)
+
+
+def _signals(i: int) -> dict:
+    return {"Q1": (i % 5) - 2, "Q5": 2, "Q11": -1}
+
+
+def test_update_crosses_capacity_boundary():
+    m = SignalMatrix(cfg["_qids"], capacity=64)
+    for i in range(300):
+        m.update(f"u{i}", _signals(i))
+
+    assert len(m) == 300
+    assert m.data.shape[0] >= 300
+    row = m.data[m.ids["u64"]]
+    assert row[cfg["_qidx"]["Q1"]] == _signals(64)["Q1"]
+    assert row[cfg["_qidx"]["Q2"]] == NULL_SIGNAL
+
+
+def test_max_users_evicts_least_recently_updated():
+    m = SignalMatrix(cfg["_qids"], capacity=2, max_users=3)
+    for uid in ("a", "b", "c"):
+        m.update(uid, {"Q1": 1})
+    m.update("a", {"Q2": 1})
+    m.update("d", {"Q3": 2})
+
+    assert list(m.ids) == ["c", "a", "d"]
+    assert m.data.shape[0] == 3
+    row = m.data[m.ids["d"]]
+    assert row[cfg["_qidx"]["Q3"]] == 2
+    assert row[cfg["_qidx"]["Q1"]] == NULL_SIGNAL
+
+
+def test_update_skips_out_of_range_values():
+    m = SignalMatrix(cfg["_qids"])
+    m.update("u", {"Q1": 1000, "Q2": "x", "Q3": 1, "Q99": 1})
+    row = m.data[m.ids["u"]]
+    assert row[cfg["_qidx"]["Q1"]] == NULL_SIGNAL
+    assert row[cfg["_qidx"]["Q2"]] == NULL_SIGNAL
+    assert row[cfg["_qidx"]["Q3"]] == 1
+
+
+def test_assess_all_matches_assess_stage():
+    m = SignalMatrix(cfg["_qids"], capacity=2, max_users=4)
+    users = {f"u{i}": _signals(i) for i in range(6)}
+    for uid, sig in users.items():
+        m.update(uid, sig)
+
+    ids, probs = m.assess_all(cfg)
+    assert ids == ["u2", "u3", "u4", "u5"]
+    for uid, p in zip(ids, probs):
+        expected, _, _, _ = assess_stage(cfg, users[uid])
+        assert np.allclose(p, [expected[s] for s in cfg["stages"]])
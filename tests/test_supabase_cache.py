@@ -0,0 +1,190 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+import app.supabase_store as ss
+
+TURN = dict(stage_probs={}, confidence="low", coverage=0.0, config_version="v", config_hash="h")
+
+
+class FakePostgrest:
+    """In-memory PostgREST stand-in; `gate_posts` / `gate_gets` pause requests until released."""
+
+    def __init__(self):
+        self.conversations = []
+        self.snapshots = []
+        self.gets = 0
+        self.gate_posts = None
+        self.gate_gets = None
+        self.get_started = asyncio.Event()
+        self.fail_posts = None  # None | "status" | "transport-conversations"
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        is_conv = ss.SUPABASE_CONVERSATIONS_TABLE in request.url.path
+        if request.method == "GET":
+            self.gets += 1
+            self.get_started.set()
+            if self.gate_gets is not None:
+                await self.gate_gets.wait()
+            if is_conv:
+                limit = int(request.url.params["limit"])
+                return httpx.Response(200, json=list(reversed(self.conversations))[:limit])
+            return httpx.Response(200, json=[{"signals": self.snapshots[-1]}] if self.snapshots else [])
+
+        if self.fail_posts == "transport-conversations" and is_conv:
+            raise httpx.ConnectError("boom", request=request)
+        if self.gate_posts is not None:
+            await self.gate_posts.wait()
+        if self.fail_posts == "status":
+            return httpx.Response(500)
+        body = json.loads(request.content)
+        if is_conv:
+            self.conversations.extend(body)
+        else:
+            self.snapshots.append(body["signals"])
+        return httpx.Response(201)
+
+    def history(self, limit):
+        return [{"role": r["role"], "content": r["content"]} for r in self.conversations[-limit:]]
+
+
+@pytest.fixture
+def make_store(monkeypatch):
+    monkeypatch.setattr(ss, "SUPABASE_URL", "https://example.supabase.co")
+    monkeypatch.setattr(ss, "SUPABASE_KEY", "key")
+    monkeypatch.setattr(ss, "SUPABASE_READ_CACHE_TTL", 30.0)
+
+    def make(db):
+        client = httpx.AsyncClient(transport=httpx.MockTransport(db))
+        monkeypatch.setattr(ss, "_client", lambda: client)
+        return ss.SupabaseStore()
+
+    return make
+
+
+async def _persist(store, i, **kw):
+    await store.persist_turn(user_id="u", user_message=f"m{i}", assistant_message=f"a{i}", signals={"Q1": i}, **TURN, **kw)
+
+
+def test_cache_off_reads_every_time(make_store, monkeypatch):
+    monkeypatch.setattr(ss, "SUPABASE_READ_CACHE_TTL", 0.0)
+
+    async def run():
+        db = FakePostgrest()
+        store = make_store(db)
+        await _persist(store, 0)
+        for _ in range(2):
+            assert await store.load_recent_conversation("u", limit=6) == db.history(6)
+        assert db.gets == 2
+        assert store._conv_cache is None
+
+    asyncio.run(run())
+
+
+def test_write_through_appends_and_trims_to_limit(make_store):
+    async def run():
+        db = FakePostgrest()
+        store = make_store(db)
+        for i in range(2):
+            await _persist(store, i)
+        assert await store.load_recent_conversation("u", limit=6) == db.history(6)
+        assert await store.load_latest_signal_snapshot("u") == {"Q1": 1}
+        gets = db.gets
+
+        for i in range(2, 6):
+            await _persist(store, i)
+            assert await store.load_recent_conversation("u", limit=6) == db.history(6)
+            assert await store.load_latest_signal_snapshot("u") == {"Q1": i}
+        assert db.gets == gets
+        limit, rows = store._conv_cache["u"]
+        assert limit == 6 and len(rows) == 6
+
+    asyncio.run(run())
+
+
+def test_limit_mismatch_refetches(make_store):
+    async def run():
+        db = FakePostgrest()
+        store = make_store(db)
+        for i in range(3):
+            await _persist(store, i)
+        await store.load_recent_conversation("u", limit=6)
+        gets = db.gets
+        assert await store.load_recent_conversation("u", limit=2) == db.history(2)
+        assert db.gets == gets + 1
+
+    asyncio.run(run())
+
+
+def test_failed_persist_invalidates(make_store):
+    async def run():
+        db = FakePostgrest()
+        store = make_store(db)
+        await _persist(store, 0)
+        await store.load_recent_conversation("u", limit=6)
+        await store.load_latest_signal_snapshot("u")
+        assert "u" in store._conv_cache and "u" in store._snap_cache
+
+        db.fail_posts = "status"
+        with pytest.raises(httpx.HTTPStatusError):
+            await _persist(store, 1)
+        assert "u" not in store._conv_cache and "u" not in store._snap_cache
+
+    asyncio.run(run())
+
+
+def test_read_during_persist_does_not_fill(make_store):
+    async def run():
+        db = FakePostgrest()
+        store = make_store(db)
+        db.gate_posts = asyncio.Event()
+        persist = asyncio.create_task(_persist(store, 0))
+        await asyncio.sleep(0.01)
+
+        await store.load_recent_conversation("u", limit=6)
+        await store.load_latest_signal_snapshot("u")
+        assert "u" not in store._conv_cache and "u" not in store._snap_cache
+
+        db.gate_posts.set()
+        await persist
+
+    asyncio.run(run())
+
+
+def test_read_spanning_persist_does_not_fill(make_store):
+    async def run():
+        db = FakePostgrest()
+        store = make_store(db)
+        db.gate_gets = asyncio.Event()
+        read = asyncio.create_task(store.load_recent_conversation("u", limit=6))
+        await db.get_started.wait()
+
+        await _persist(store, 0)
+        db.gate_gets.set()
+        await read
+        assert "u" not in store._conv_cache
+
+    asyncio.run(run())
+
+
+def test_failed_leg_waits_for_other_insert(make_store):
+    async def run():
+        db = FakePostgrest()
+        store = make_store(db)
+        db.fail_posts = "transport-conversations"
+        db.gate_posts = asyncio.Event()
+        persist = asyncio.create_task(_persist(store, 0))
+        await asyncio.sleep(0.01)
+
+        # The snapshot insert is still running, so the persist must still be in flight
+        assert not persist.done()
+        assert "u" in store._inflight
+
+        db.gate_posts.set()
+        with pytest.raises(httpx.ConnectError):
+            await persist
+        assert "u" not in store._inflight
+
+    asyncio.run(run())